@@ -0,0 +1,139 @@
+import numpy as np
+import argparse
+import timeit
+import energy
+
+
+def initialize():
+    """
+    An argument parser as an intializing function
+    """
+
+    parser = argparse.ArgumentParser(
+        description='This code measures the per-pair cost of the energy \
+                    calculation, comparing the former implementation \
+                    (one square root and two np.power calls per pair) with \
+                    the squared-distance implementation of energy.py.')
+    parser.add_argument('-N',
+                        '--N_particles',
+                        type=int,
+                        required=False,
+                        default=500,
+                        help='The number of particles. Default: 500.')
+    parser.add_argument('-r',
+                        '--repeat',
+                        type=int,
+                        required=False,
+                        default=5,
+                        help='The number of repetitions of each timing, of \
+                            which the best one is reported. Default: 5.')
+    parser.add_argument('-c',
+                        '--cache_size',
+                        type=int,
+                        required=False,
+                        default=100000,
+                        help='The maximum number of entries of the energy \
+                            cache. Default: 100000.')
+    parser.add_argument('-t',
+                        '--cache_tolerance',
+                        type=float,
+                        required=False,
+                        default=None,
+                        help='The tolerance of the keys of the energy \
+                            cache. Default: None (exact keys).')
+    parser.add_argument('-s',
+                        '--seed',
+                        type=int,
+                        required=False,
+                        default=2019,
+                        help='The seed for placing the particles. \
+                            Default: 2019.')
+
+    args_parse = parser.parse_args()
+    return args_parse
+
+
+def legacy_pair_ener(coordinates, box_length, i_particle, cutoff):
+    """
+    The former implementation of Energy.calc_pair_ener, kept here as the
+    reference of the benchmark: a Python loop over the pairs with a square
+    root per pair and the LJ energy computed by np.power on scalars.
+    """
+    e_total = 0.0
+    r_i = coordinates[i_particle]
+    for j_particle in range(len(coordinates)):
+        if i_particle != j_particle:
+            rij = r_i - coordinates[j_particle]
+            rij = rij - box_length * np.round(rij / box_length)
+            r = np.sqrt(np.dot(rij, rij))
+            if r < cutoff:
+                e_total += 4.0 * (np.power(1 / r, 12) - np.power(1 / r, 6))
+    return e_total
+
+
+def best_time(func, repeat):
+    """
+    Returns the best wall time (in seconds) of a single call of func.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    args = initialize()
+
+    rng = np.random.default_rng(args.seed)
+    box_length = np.cbrt(args.N_particles / 0.9)
+    coordinates = (0.5 - rng.random((args.N_particles, 3))) * box_length
+    n_pairs = args.N_particles - 1
+    ener = energy.Energy()
+    model = energy.UnitlessLennardJones()
+    r2 = float(rng.uniform(1.0, 9.0))
+
+    print('Per-pair cost of the energy calculation (N = %s)' %
+          args.N_particles)
+    print('==================================================')
+
+    t_legacy = best_time(lambda: legacy_pair_ener(
+        coordinates, box_length, 0, ener.simulation_cutoff), args.repeat)
+    t_pair = best_time(lambda: ener.calc_pair_ener(
+        coordinates, box_length, 0), args.repeat)
+    print('sqrt + np.power loop:     %10.1f ns/pair' %
+          (t_legacy / n_pairs * 1e9))
+    print('vectorized r2 arithmetic: %10.1f ns/pair' %
+          (t_pair / n_pairs * 1e9))
+    print('Speedup: %.1fx\n' % (t_legacy / t_pair))
+
+    # the scalar kernels alone (without the cache)
+    r = np.sqrt(r2)
+    t_power = best_time(lambda: 4.0 * (np.power(1 / r, 12) -
+                                       np.power(1 / r, 6)), args.repeat)
+    t_mult = best_time(lambda: model.calc_energy(r2), args.repeat)
+    print('Scalar kernel, np.power:         %8.1f ns' % (t_power * 1e9))
+    print('Scalar kernel, multiplications:  %8.1f ns\n' % (t_mult * 1e9))
+
+    # whether the LRU energy cache pays off for each model: every pair is
+    # visited twice when the energies of all the particles are computed
+    print('Per-pair cost with and without the energy cache')
+    print('===============================================')
+    for potential_type in ['UnitlessLJ', 'LJ', 'Buckingham']:
+        timings = []
+        for cache_size, tolerance in [(None, None),
+                                      (args.cache_size, args.cache_tolerance)]:
+            ener = energy.Energy(potential_type, cache_size=cache_size,
+                                 cache_tolerance=tolerance)
+            start = timeit.default_timer()
+            for i in range(args.N_particles):
+                ener.calc_pair_ener(coordinates, box_length, i)
+            timings.append((timeit.default_timer() - start) /
+                           (args.N_particles * n_pairs))
+        stats = ener.cache_stats()
+        print('%-10s  exact: %8.1f ns/pair  cached: %8.1f ns/pair  '
+              'hit rate: %.2f  evictions: %s' % (
+                  potential_type, timings[0] * 1e9, timings[1] * 1e9,
+                  stats['hit_rate'], stats['evictions']))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import numpy as np
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 
 class EnergyModel(ABC):
     """This class is an abstract class for all the energy functions that are
     going to be written. All energy functions that inherit this structure MUST
     have a calc_energy method and a cutoff_correction method.
+
+    calc_energy takes the SQUARED distance r2 (either a float or a numpy
+    array of squared distances), so that no square root is needed for
+    potentials that only depend on even powers of r.
     """
 
     @abstractmethod
@@ -34,15 +39,11 @@ class LennardJones(EnergyModel):
             print('Invalid input parameters. Use default instead.')
             self.sigma = 1.0
             self.epsilon = 0.5
-        self.ener_cache = {}
-
-    def calc_energy(self, r):
-        if r in self.ener_cache.keys():
-            return self.ener_cache[r]
-        e = (4 * self.epsilon * ((self.sigma / r) ** 12 -
-                                 (self.sigma / r) ** 6))
-        self.ener_cache[r] = e
-        return e
+
+    def calc_energy(self, r2):
+        sr2 = self.sigma * self.sigma / r2
+        sr6 = sr2 * sr2 * sr2
+        return 4 * self.epsilon * (sr6 * sr6 - sr6)
 
     def cutoff_correction(self, cutoff=None, number_particles=None,
                           box_length=None):
@@ -68,14 +69,11 @@ class Buckingham(EnergyModel):
         except ValueError:
             print('Invalid input parameters. Use default instead.')
             self.rho, self.a, self.c = 1.0, 1.0, 1.0
-        self.ener_cache = {}
 
-    def calc_energy(self, r):
-        if r in self.ener_cache.keys():
-            return self.ener_cache[r]
-        e = self.a * np.exp(-r / self.rho) - self.c / r ** 6
-        self.ener_cache[r] = e
-        return e
+    def calc_energy(self, r2):
+        # the exponential term is the only one that needs r itself
+        return (self.a * np.exp(-np.sqrt(r2) / self.rho) -
+                self.c / (r2 * r2 * r2))
 
     def cutoff_correction(self, cutoff=None, number_particles=None,
                           box_length=None):
@@ -87,18 +85,14 @@ class UnitlessLennardJones(EnergyModel):
 
     Parameters
     ----------
-    r: float, int
+    r2: float, int, np.ndarray
+        the squared distance(s) passed to calc_energy
     """
 
-    def __init__(self):
-        self.ener_cache = {}
-
-    def calc_energy(self, r: (int, float) = None):
-        if r in self.ener_cache.keys():
-            return self.ener_cache[r]
-        e = (4.0 * (np.power(1 / r, 12) - np.power(1 / r, 6)))
-        self.ener_cache[r] = e
-        return e
+    def calc_energy(self, r2: (int, float, np.ndarray) = None):
+        ir2 = 1.0 / r2
+        ir6 = ir2 * ir2 * ir2
+        return 4.0 * (ir6 * ir6 - ir6)
 
     def cutoff_correction(self, cutoff, number_particles, box_length):
         volume = np.power(box_length, 3)
@@ -111,6 +105,104 @@ class UnitlessLennardJones(EnergyModel):
         return e_correction
 
 
+class EnergyCache:
+    """A memory-bounded memoization table of energies with least recently
+    used (LRU) eviction, which counts its hits, misses and evictions.
+
+    Parameters
+    ----------
+    max_entries: int
+        the maximum number of cached energies
+    tolerance: float
+        if specified, the squared distances are rounded to multiples of
+        tolerance, and the energy is evaluated at the rounded value. The
+        squared distances below tolerance are not cached, since they would
+        be rounded to 0 (or to tolerance itself, far from the steep core).
+    """
+
+    def __init__(self, max_entries: int = 100000, tolerance: float = None):
+        if max_entries < 1:
+            raise ValueError('max_entries should be a positive integer.')
+        if tolerance is not None and tolerance <= 0:
+            raise ValueError('tolerance should be positive.')
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.entries = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def lookup(self, r2, calc_energy):
+        """Returns the cached energy of r2, or computes it with calc_energy
+        and caches it, evicting the least recently used entry if the cache
+        is full.
+        """
+        if self.tolerance is None:
+            key = r2
+        elif r2 < self.tolerance:
+            return calc_energy(r2)
+        else:
+            key = round(r2 / self.tolerance)
+        try:
+            e = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            if self.tolerance is not None:
+                r2 = key * self.tolerance
+            e = calc_energy(r2)
+            self.entries[key] = e
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return e
+
+    def clear(self):
+        self.entries.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        """Returns the counters of the cache as a dictionary."""
+        n_lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hit_rate': self.hits / n_lookups if n_lookups else 0.0}
+
+
+class CachedEnergyModel(EnergyModel):
+    """Wraps any energy model with an EnergyCache. An array of squared
+    distances is looked up element by element, so caching only pays off for
+    models whose energy is much more expensive than a dictionary lookup.
+
+    Parameters
+    ----------
+    model: EnergyModel
+        the energy model to be cached
+    max_entries: int
+    tolerance: float
+        see EnergyCache
+    """
+
+    def __init__(self, model: EnergyModel, max_entries: int = 100000,
+                 tolerance: float = None):
+        self.model = model
+        self.cache = EnergyCache(max_entries, tolerance)
+
+    def calc_energy(self, r2):
+        if isinstance(r2, np.ndarray):
+            return np.array([self.cache.lookup(x, self.model.calc_energy)
+                             for x in r2.tolist()], dtype=float)
+        return self.cache.lookup(r2, self.model.calc_energy)
+
+    def cutoff_correction(self, cutoff=None, number_particles=None,
+                          box_length=None):
+        return self.model.cutoff_correction(cutoff, number_particles,
+                                            box_length)
+
+
 class potentialEnergyFactory:
     def __init__(self):
         self.methods = {'LJ': LennardJones,
@@ -126,10 +218,41 @@ class potentialEnergyFactory:
 
 class Energy:
     def __init__(self, potential_type='UnitlessLJ', simulation_cutoff=3.0,
-                 **kwargs):
+                 cache_size=None, cache_tolerance=None, **kwargs):
+        """
+        Parameters
+        ----------
+        potential_type: str
+            the energy model, one of the keys of potentialEnergyFactory
+        simulation_cutoff: float, int
+            the cutoff distance of the interactions
+        cache_size: int
+            if specified, the energies are memoized in an EnergyCache of at
+            most cache_size entries (default: None, no caching)
+        cache_tolerance: float
+            the tolerance of the squared distances used as the keys of the
+            cache, which requires cache_size (default: None, exact keys)
+        **kwargs
+            the parameters of the energy model
+        """
+        if cache_tolerance is not None and cache_size is None:
+            raise ValueError('cache_tolerance requires cache_size.')
         self.energy_obj = potentialEnergyFactory().build_energy_method(
             potential_type, **kwargs)
+        if cache_size is not None:
+            self.energy_obj = CachedEnergyModel(
+                self.energy_obj, cache_size, cache_tolerance)
         self.simulation_cutoff = simulation_cutoff
+        # distances are compared squared to avoid taking square roots
+        self.simulation_cutoff2 = simulation_cutoff * simulation_cutoff
+
+    def cache_stats(self):
+        """Returns the hits, misses, evictions, number of entries and hit
+        rate of the energy cache, or None if the energies are not cached.
+        """
+        if isinstance(self.energy_obj, CachedEnergyModel):
+            return self.energy_obj.cache.stats()
+        return None
 
     def calc_tail(self, number_particles, box_length):
         """This function computes the standard tail
@@ -151,31 +274,29 @@ class Energy:
             self.simulation_cutoff, number_particles, box_length)
         return e_correction
 
-    def _minimum_image_distance(self, r_i, r_j, box_length):
+    def _minimum_image_distance2(self, r_i, r_j, box_length):
         """
-        Calculates the shortest distance between a particle and another
-        instance in a periodic boundary condition image
+        Calculates the squared shortest distance between a particle and
+        other particles (or their periodic images) under the periodic
+        boundary condition
         Parameters
         ----------
-        r_i: np.array([n,3])
+        r_i: np.array([3])
             The x, y, z coordinates for a particle, i.
-        r_j: np.array([n,3])
-            The x, y, z coordinates for a particle, j.
+        r_j: np.array([3]) or np.array([n,3])
+            The x, y, z coordinates for a particle, j, or for n particles.
         box_length: float, int
             The length of a side of the side box for the periodic boundary.
         Returns
         -------
-        rij2: np.array([n,3])
-            The minimum image distance between the two particles, r_i and r_j.
+        rij2: float or np.array([n])
+            The squared minimum image distance(s) between r_i and r_j.
         """
-        # This function computes the minimum image distance
-        # between two particles
         rij = r_i - r_j
         rij = rij - box_length * np.round(rij / box_length)
-        rij2 = np.dot(rij, rij)
-        distance = np.sqrt(rij2)
+        rij2 = np.einsum('...i,...i->...', rij, rij)
 
-        return distance
+        return rij2
 
     def calc_init_ener(self, coordinates, box_length):
         """Iterates over a set of coordinates to calculate total system energy
@@ -191,11 +312,6 @@ class Energy:
         box_length : float
             A float indicating the size of the simulation box. Can be either
             hard-coded or calculated using num_particles and reduced_density.
-        cutoff: float
-            The square of the simulation_cutoff, which is the cutoff distance
-            between two interacting particles.
-        i_particle: int
-            Intitial particle for pairwise count
         Returns
         -------
         e_total : float
@@ -204,20 +320,18 @@ class Energy:
         """
         e_total = 0.0
         particle_count = len(coordinates)
-        for i_particle in range(particle_count):
-            for j_particle in range(i_particle):
-                r_i = coordinates[i_particle]
-                r_j = coordinates[j_particle]
-                rij = self._minimum_image_distance(r_i, r_j, box_length)
-                if rij < self.simulation_cutoff:
-                    e_pair = self.energy_obj.calc_energy(rij)
-                    e_total += e_pair
-        return e_total
+        for i_particle in range(1, particle_count):
+            # all the pairs (i, j) with j < i at once
+            rij2 = self._minimum_image_distance2(
+                coordinates[i_particle], coordinates[:i_particle], box_length)
+            rij2 = rij2[rij2 < self.simulation_cutoff2]
+            e_total += self.energy_obj.calc_energy(rij2).sum()
+        return float(e_total)
 
     def calc_pair_ener(self, coordinates, box_length, i_particle):
         """This function computes the sum of
-           all pairwise VDW energy between each
-           pair of particles in the system.
+           all pairwise VDW energy between a particle
+           and the rest of the particles in the system.
         Parameters
         ----------
         coordinates : np.array
@@ -226,37 +340,17 @@ class Energy:
         box_length : float
             A float indicating the size of the simulation box. Can be either
             hard-coded or calculated using num_particles and reduced_density.
-        cutoff: float
-            The square of the simulation_cutoff, which is the cutoff distance
-            between two interacting particles.
         i_particle: integer
             Intitial particle for pairwise count
         Returns
         -------
         e_total : float
-            The sum of all pairwise VDW energy between each pair of
-            particles in the system.
+            The sum of all pairwise VDW energy between the particle
+            i_particle and the rest of the particles in the system.
         """
-
-        # This function computes the energy of a particle with
-        # the rest of the system
-
-        e_total = 0.0
-
-        i_position = coordinates[i_particle]
-
-        particle_count = len(coordinates)
-
-        for j_particle in range(particle_count):
-
-            if i_particle != j_particle:
-
-                j_position = coordinates[j_particle]
-
-                rij = self._minimum_image_distance(i_position, j_position,
-                                                   box_length)
-
-                if rij < self.simulation_cutoff:
-                    e_pair = self.energy_obj.calc_energy(rij)
-                    e_total += e_pair
-        return e_total
+        rij2 = self._minimum_image_distance2(
+            coordinates[i_particle], coordinates, box_length)
+        mask = rij2 < self.simulation_cutoff2
+        mask[i_particle] = False
+        e_total = self.energy_obj.calc_energy(rij2[mask]).sum()
+        return float(e_total)
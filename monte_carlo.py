@@ -1,16 +1,18 @@
 import numpy as np
 import argparse
 import energy
-import matplotlib.pyplot as plt
+import result_store
 import sys
 import os
-from matplotlib import rc
-from mpl_toolkits.mplot3d import Axes3D
+import time
+import queue
+import threading
 
 
 class SystemSetup:
     def __init__(self, N_particles: int = 500, reduced_rho:
-                 (int, float) = 0.9):
+                 (int, float) = 0.9, rng: object = None,
+                 coordinates: np.ndarray = None):
         """
         A function that sets up the system for the Monte Carlo
         simulation.
@@ -21,19 +23,134 @@ class SystemSetup:
             the number of particles (default: 500)
         reduced_rho : float
             the reduced density (default: 0.9)
+        rng : obj
+            A numpy.random.Generator used to place the particles, which is
+            kept as self.rng so that MonteCarlo continues the same stream.
+            If not specified, the global numpy random state is used.
+        coordinates : np.array([N_particles, 3])
+            The initial coordinates of the particles (e.g. the final
+            configuration of a previous run). If specified, the particles
+            are not placed randomly and no random number is drawn.
         """
         self.N_particles = N_particles
         self.reduced_rho = reduced_rho
         self.box_length = np.cbrt(self.N_particles / self.reduced_rho)
-        self.coordinates = (0.5 - np.random.rand(self.N_particles, 3)) * \
-            self.box_length
+        self.rng = rng
+        if coordinates is not None:
+            self.coordinates = np.array(coordinates, dtype=float)
+            return
+        if rng is None:
+            random_coords = np.random.rand(self.N_particles, 3)
+        else:
+            random_coords = rng.random((self.N_particles, 3))
+        self.coordinates = (0.5 - random_coords) * self.box_length
 
     # SystemSetup: finished
 
 
+class OutputWriter(threading.Thread):
+    def __init__(self, traj_file: str = 'traj_output.xyz',
+                 max_queued: int = 64):
+        """
+        A background thread that performs all the output of the Monte
+        Carlo simulation (STDOUT, trajectory frames and figures), so the
+        sampling loop never blocks on the disk or on matplotlib. The jobs
+        are fed by a bounded queue, which means that the sampler only
+        waits when the writer falls behind by more than max_queued jobs.
+
+        Parameters
+        ----------
+        traj_file : str
+            The file name of the trajectory data file. No trajectory data
+            file is written if None.
+        max_queued : int
+            The maximum number of pending jobs (e.g. coordinate snapshots)
+            in the queue (default: 64)
+        """
+        super().__init__(daemon=True)
+        self.traj_file = traj_file
+        # opened here so that a bad path fails before the simulation starts
+        if self.traj_file is None:
+            self.traj = None
+        else:
+            self.traj = open(self.traj_file, 'w')
+        self.jobs = queue.Queue(maxsize=max_queued)
+        self.error = None
+        self.reported = False
+
+    def submit(self, func, *args):
+        """
+        A function for queueing a job to be executed by the writer thread.
+        Any array passed to the job must be a snapshot (a copy) since the
+        sampler keeps modifying its coordinates.
+
+        Parameters
+        ----------
+        func : callable
+            The function to be called in the writer thread
+        *args
+            The arguments passed to func
+        """
+        # report a failed job (e.g. a full disk) as soon as possible
+        # instead of after the whole simulation
+        if self.error is not None:
+            self.reported = True
+            raise self.error
+        self.jobs.put((func, args))
+
+    def write_frame(self, step, coordinates):
+        """
+        A function for appending a frame to the trajectory data file
+        (in the xyz format).
+
+        Parameters
+        ----------
+        step : int
+            The Monte Carlo step of the frame
+        coordinates : np.array([n, 3])
+            A snapshot of the coordinates of the particles
+        """
+        lines = [str(len(coordinates)) + '\n', f'Step: {step} \n']
+        for x, y, z in coordinates:
+            lines.append('Ar  ' + str(x) + '  ' + str(y) + '  ' + str(z) +
+                         '\n')
+        self.traj.writelines(lines)
+
+    def run(self):
+        while True:
+            func, args = self.jobs.get()
+            if func is None:
+                self.jobs.task_done()
+                break
+            if self.error is None:
+                try:
+                    func(*args)
+                except Exception as err:
+                    # keep draining the queue so the sampler never
+                    # blocks, and re-raise the error in submit() and close()
+                    self.error = err
+            self.jobs.task_done()
+        if self.traj is not None:
+            self.traj.close()
+        sys.stdout.flush()
+
+    def close(self):
+        """
+        A function for waiting until all the queued jobs are done. Any
+        exception raised in the writer thread and not yet reported by
+        submit() is re-raised here.
+        """
+        self.jobs.put((None, ()))
+        self.join()
+        if self.error is not None and not self.reported:
+            self.reported = True
+            raise self.error
+
+
 class MonteCarlo:
     def __init__(self, system: object = None, energy: object = None,
-                 args: object = None):
+                 args: object = None, rng: object = None,
+                 block_size: int = 65536):
         """
         A initializing function for the class MonteCarlo
 
@@ -45,6 +162,16 @@ class MonteCarlo:
             An Energy object which specifies the types of energy
         args : obj
             An arguement parser object returned by the function initialize
+        rng : obj
+            A numpy.random.Generator for the trial moves and the acceptance
+            tests. If not specified, the generator of system is used, or an
+            unseeded one if system has none. args.seed is not used here:
+            only run() seeds both the placement of the particles and the
+            moves, so a simulation built by hand is only reproducible if
+            its SystemSetup is given a seeded generator.
+        block_size : int
+            The number of steps for which the random numbers are drawn at
+            once (default: 65536)
         """
 
         # get parameters from the class SystemSetup
@@ -61,7 +188,46 @@ class MonteCarlo:
         # get parameters from the method initialize
         self.args = args
 
-    def metropolis_mc(self, delta_e: float, beta: float):
+        if rng is None:
+            rng = system.rng
+        if rng is None:
+            rng = np.random.default_rng()
+        self.rng = rng
+        self.block_size = block_size
+
+    def draw_random_block(self, n_draws: int = None):
+        """
+        A function for drawing the random numbers of the next Monte Carlo
+        steps at once, which is much cheaper than calling the generator
+        three times per step.
+
+        Parameters
+        ----------
+        n_draws : int
+            The number of steps to draw the random numbers for, at most
+            block_size (default: block_size)
+
+        Returns
+        -------
+        i_particles : np.array([n_draws])
+            The indices of the particles to be displaced
+        displacements : np.array([n_draws, 3])
+            The displacements in units of the maximum displacement, which
+            are uniformly distributed in [-1, 1)
+        uniforms : np.array([n_draws])
+            The uniform random numbers in [0, 1) for the acceptance tests
+        """
+        if n_draws is None:
+            n_draws = self.block_size
+        n_draws = min(n_draws, self.block_size)
+        i_particles = self.rng.integers(self.N_particles, size=n_draws)
+        displacements = 2.0 * self.rng.random((n_draws, 3)) - 1.0
+        uniforms = self.rng.random(n_draws)
+
+        return i_particles, displacements, uniforms
+
+    def metropolis_mc(self, delta_e: float, beta: float,
+                      uniform: float = None):
         """
         A function which implements the Metropolis-Hastings algorithm to decide
         whether to accept or reject the proposed moves.
@@ -72,6 +238,9 @@ class MonteCarlo:
             The difference between the proposed and the current energies
         beta : float
             The inverse temperature
+        uniform : float
+            A pre-drawn uniform random number in [0, 1). If not specified,
+            one is drawn from the generator of the simulation.
 
         Returns
         -------
@@ -84,8 +253,10 @@ class MonteCarlo:
             accept = True
         else:
             p_acc = np.exp(-beta * delta_e)
+            if uniform is None:
+                uniform = self.rng.random()
 
-            if np.random.rand() < p_acc:
+            if uniform < p_acc:
                 accept = True
             else:
                 accept = False
@@ -99,7 +270,11 @@ class MonteCarlo:
         particle overlaps/low acceptance rate and inefficient
         sampling, respectively. Therefore, when the acceptance
         rate is too high, the max displacement should be adjusted
-        to be higher and vice versa.
+        to be higher and vice versa. The max displacement is capped at
+        half of the box length, beyond which larger displacements are
+        equivalent under the periodic boundary conditions (otherwise it
+        grows without bound at low densities, where almost all the trials
+        are accepted).
 
         Parameters
         ----------
@@ -126,56 +301,85 @@ class MonteCarlo:
         if acc_rate < 0.38:
             max_d *= 0.8
         elif acc_rate > 0.42:
-            max_d *= 1.2
+            max_d = min(max_d * 1.2, self.box_length / 2)
 
         n_trials, n_accept = 0, 0
 
         return max_d, n_accept, n_trials
 
+    def plot_configuration(self, coordinates, title, filename):
+        """
+        A function for plotting a configuration of the system as a 3D
+        scatter plot. It is executed by the background writer thread, so
+        it only uses the object-oriented interface of matplotlib instead
+        of the (non-thread-safe) pyplot state machine.
+
+        Parameters
+        ----------
+        coordinates : np.array([n, 3])
+            A snapshot of the coordinates of the particles
+        title : str
+            The title of the figure
+        filename : str
+            The file name of the output figure
+        """
+        # imported here since matplotlib is only needed for plotting
+        from matplotlib.figure import Figure
+        from mpl_toolkits.mplot3d import Axes3D  # registers 3d projection
+
+        fig = Figure()
+        ax = fig.add_subplot(projection='3d')
+        ax.set_xlim([-self.box_length/2, self.box_length/2])
+        ax.set_ylim([-self.box_length/2, self.box_length/2])
+        ax.set_zlim([-self.box_length/2, self.box_length/2])
+        ax.set_xlabel('x coordinate')
+        ax.set_ylabel('y coordinate')
+        ax.set_zlabel('z coordinate')
+        # a single scatter call instead of one plot3D call per particle
+        ax.scatter(coordinates[:, 0], coordinates[:, 1], coordinates[:, 2],
+                   c=np.arange(len(coordinates)), cmap='tab10')
+        ax.set_title(title, fontsize=10, weight='bold')
+        fig.savefig(filename)
+
     def MC_simulation(self):
         """
         This is the primary function that perform a Monte Carlo simulation
         """
 
-        if args.plot:
-            plt.figure()
-            ax = plt.axes(projection='3d')
-            ax.set_xlim([-self.box_length/2, self.box_length/2])
-            ax.set_ylim([-self.box_length/2, self.box_length/2])
-            ax.set_zlim([-self.box_length/2, self.box_length/2])
-            ax.set_xlabel('x coordinate')
-            ax.set_ylabel('y coordinate')
-            ax.set_zlabel('z coordinate')
-            for i in range(self.args.N_particles):
-                ax.plot3D([self.coordinates[i, 0]],
-                          [self.coordinates[i, 1]],
-                          [self.coordinates[i, 2]], 'o')
-            plt.minorticks_on
-            plt.title('Initial configuration of the Lennard-Jones particles',
-                      fontsize=10, weight='bold')
-            plt.savefig('structure_initial.png')
-
-        print('Adopted parameters')
-        print('==================')
-        print('Number of particles: ', self.N_particles)
-        print('The reduced density: ', self.args.reduced_rho)
-        print('Corresponding box length: ', self.box_length)
-        print('The reduced temperature: ', self.args.reduced_T)
-        print('The number of Monte Carlo steps: ', self.args.n_steps)
-        print('The initial maximum of the displacement:, ', self.args.max_d)
-        print('The output frequency of energy as the STDOUT: ',
-              self.args.freq_ener)
-        print('The output frequency of the trajectory data: ',
-              self.args.freq_traj)
-        print('Adopted energy model: %s\n' % self.args.energy)
-        print('Results')
-        print('=======')
+        writer = OutputWriter(self.args.traj_file)
+        writer.start()
+
+        if self.args.plot:
+            set_plot_style()
+            writer.submit(self.plot_configuration, self.coordinates.copy(),
+                          'Initial configuration of the Lennard-Jones '
+                          'particles', 'structure_initial.png')
+
+        verbose = not self.args.quiet
+        if verbose:
+            print('Adopted parameters')
+            print('==================')
+            print('Number of particles: ', self.N_particles)
+            print('The reduced density: ', self.args.reduced_rho)
+            print('Corresponding box length: ', self.box_length)
+            print('The reduced temperature: ', self.args.reduced_T)
+            print('The number of Monte Carlo steps: ', self.args.n_steps)
+            print('The initial maximum of the displacement:, ',
+                  self.args.max_d)
+            print('The output frequency of energy as the STDOUT: ',
+                  self.args.freq_ener)
+            print('The output frequency of the trajectory data: ',
+                  self.args.freq_traj)
+            print('Adopted energy model: %s\n' % self.args.energy)
+            print('Results')
+            print('=======')
 
         # set the initial total pair energy between particles in the system
         total_pair_energy = self.init_ener
-        print(f'total pair initial: {total_pair_energy}')
         tail_correction = self.tail
-        print(f'tail correction: {tail_correction}')
+        if verbose:
+            print(f'total pair initial: {total_pair_energy}')
+            print(f'tail correction: {tail_correction}')
 
         # set up an array to store energy values
         energy_array = np.zeros(self.args.n_steps)
@@ -183,87 +387,86 @@ class MonteCarlo:
         # start the Monte Carlo iterations
         n_trials = 0
         n_accept = 0
-
-        # check to make sure we write to an empty file
-        with open(self.args.traj_file, "w") as fn:
-            pass
-        for i_step in range(self.args.n_steps):
-            # print(f'Step{i_step}:')
-            n_trials += 1
-            i_particle = np.random.randint(self.N_particles)
-            random_displacement = (
-                2.0 * np.random.rand(3) - 1.0) * self.args.max_d
-            # print(f'random displacement: {random_displacement}')
-            current_energy = self.energy.calc_pair_ener(
-                self.coordinates, self.box_length, i_particle)
-            # print(f'current energy: {current_energy}')
-            proposed_coordinates = self.coordinates.copy()
-            proposed_coordinates[i_particle] += random_displacement
-            proposed_coordinates -= self.box_length * \
-                np.round(proposed_coordinates / self.box_length)
-            proposed_energy = self.energy.calc_pair_ener(
-                proposed_coordinates, self.box_length, i_particle)
-            # print(f'i particle: {i_particle}')
-            # print(f'proposd energy: {proposed_energy}')
-            delta_e = proposed_energy - current_energy
-            beta = 1.0 / self.args.reduced_T
-            accept = self.metropolis_mc(delta_e, beta)
-            # print(f'accept: {accept}')
-            if accept:
-                total_pair_energy += delta_e
-                n_accept += 1
-                self.coordinates[i_particle] += random_displacement
-                self.coordinates -= self.box_length * \
-                    np.round(self.coordinates / self.box_length)
-            total_energy = (total_pair_energy +
-                            tail_correction) / self.N_particles
-            # print(f'total energy: {total_energy}')
-            energy_array[i_step] = total_energy
-            if np.mod(i_step + 1, self.args.freq_ener) == 0:
-                print(i_step + 1, energy_array[i_step])
-                # plot
-
-            if args.plot and (i_step + 1 == self.args.n_steps):
-                plt.figure()
-                ax = plt.axes(projection='3d')
-                ax.set_xlim([-self.box_length/2, self.box_length/2])
-                ax.set_ylim([-self.box_length/2, self.box_length/2])
-                ax.set_zlim([-self.box_length/2, self.box_length/2])
-                ax.set_xlabel('x coordinate')
-                ax.set_ylabel('y coordinate')
-                ax.set_zlabel('z coordinate')
-                for i in range(self.args.N_particles):
-                    ax.plot3D([self.coordinates[i, 0]],
-                              [self.coordinates[i, 1]],
-                              [self.coordinates[i, 2]], 'o')
-                plt.minorticks_on
-                plt.title('Final configuration of the Lennard-Jones particles',
-                          fontsize=10, weight='bold')
-                plt.savefig('structure_final.png')
-
-            # Generation of the trajectory file
-            with open(self.args.traj_file, "a+") as fn:
-                # if prefer to output trajectories, open the output file
-                if np.mod(i_step + 1, self.args.freq_traj) == 0:
-                    fn.write(str(self.N_particles)+'\n')
-                    fn.write(f'Step: {i_step + 1} \n')
-                    for i_atom in range(len(self.coordinates)):
-                        fn.write('Ar  ' + str(self.coordinates[i_atom, 0]) +
-                                 '  ' + str(self.coordinates[i_atom, 1]) +
-                                 '  ' + str(self.coordinates[i_atom, 2]) +
-                                 '\n')
-
-            self.args.max_d, n_accept, n_trials = self.adjust_moves(
-                self.args.max_d, n_accept, n_trials)
+        beta = 1.0 / self.args.reduced_T
+
+        try:
+            for i_step in range(self.args.n_steps):
+                i_block = i_step % self.block_size
+                if i_block == 0:
+                    i_particles, displacements, uniforms = \
+                        self.draw_random_block(self.args.n_steps - i_step)
+                n_trials += 1
+                i_particle = i_particles[i_block]
+                random_displacement = displacements[i_block] * \
+                    self.args.max_d
+                current_energy = self.energy.calc_pair_ener(
+                    self.coordinates, self.box_length, i_particle)
+                proposed_coordinates = self.coordinates.copy()
+                proposed_coordinates[i_particle] += random_displacement
+                proposed_coordinates -= self.box_length * \
+                    np.round(proposed_coordinates / self.box_length)
+                proposed_energy = self.energy.calc_pair_ener(
+                    proposed_coordinates, self.box_length, i_particle)
+                delta_e = proposed_energy - current_energy
+                accept = self.metropolis_mc(delta_e, beta, uniforms[i_block])
+                if accept:
+                    total_pair_energy += delta_e
+                    n_accept += 1
+                    self.coordinates[i_particle] += random_displacement
+                    self.coordinates -= self.box_length * \
+                        np.round(self.coordinates / self.box_length)
+                total_energy = (total_pair_energy +
+                                tail_correction) / self.N_particles
+                energy_array[i_step] = total_energy
+                if verbose and (i_step + 1) % self.args.freq_ener == 0:
+                    writer.submit(print, i_step + 1, energy_array[i_step])
+
+                # Generation of the trajectory file
+                if self.args.traj_file is not None and \
+                        (i_step + 1) % self.args.freq_traj == 0:
+                    writer.submit(writer.write_frame, i_step + 1,
+                                  self.coordinates.copy())
+
+                self.args.max_d, n_accept, n_trials = self.adjust_moves(
+                    self.args.max_d, n_accept, n_trials)
+
+            if self.args.plot:
+                writer.submit(self.plot_configuration,
+                              self.coordinates.copy(),
+                              'Final configuration of the Lennard-Jones '
+                              'particles', 'structure_final.png')
+        finally:
+            writer.close()
 
         self.energy_array = energy_array
 
         return True
 
 
-def initialize():
+def set_plot_style():
+    """
+    A function for setting the fonts of the figures. matplotlib is imported
+    here so that it is only loaded when plotting is requested.
+    """
+    from matplotlib import rc
+
+    rc('font', **{
+        'family': 'serif',
+        'sans-serif': ['DejaVu Sans'],
+        'size': 10
+    })
+    # Set the font used for MathJax - more on this later
+    rc('mathtext', **{'default': 'regular'})
+
+
+def initialize(argv=None):
     """
     An argument parser as an initializing function.
+
+    Parameters
+    ----------
+    argv : list
+        The command-line arguments to parse (default: sys.argv[1:])
     """
     parser = argparse.ArgumentParser(
         prog='mcfluid',
@@ -326,6 +529,27 @@ def initialize():
                         help='The energy function used to calculate the \
                             interactions between the particles in the fluid \
                             Default: "UnitLessLJ".')
+    parser.add_argument('-c',
+                        '--cutoff',
+                        required=False,
+                        type=float,
+                        default=3.0,
+                        help='The cutoff distance of the interactions \
+                            between the particles. Default: 3.0.')
+    parser.add_argument('--cache_size',
+                        required=False,
+                        type=int,
+                        default=None,
+                        help='The maximum number of energies memoized in an \
+                            LRU cache. Default: None (no caching).')
+    parser.add_argument('--cache_tolerance',
+                        required=False,
+                        type=float,
+                        default=None,
+                        help='The tolerance to which the squared distances \
+                            are rounded as the keys of the energy cache, \
+                            which requires --cache_size. Default: None \
+                            (exact keys).')
     parser.add_argument('-p',
                         '--plot',
                         required=False,
@@ -338,26 +562,162 @@ def initialize():
                         required=False,
                         default='traj_output.xyz',
                         help='The file name of the trajectory data file.')
+    parser.add_argument('-s',
+                        '--seed',
+                        required=False,
+                        type=int,
+                        default=None,
+                        help='The seed of the random number generator. \
+                            Specify it to make a run reproducible. \
+                            Default: None (unpredictable).')
+    parser.add_argument('-q',
+                        '--quiet',
+                        required=False,
+                        default=False,
+                        action='store_true',
+                        help='whether to suppress the STDOUT. Specify "-q" \
+                            to suppress.')
+    parser.add_argument('-d',
+                        '--db',
+                        required=False,
+                        default=None,
+                        help='The file name of a SQLite database of results. \
+                            If specified, a seeded run found in the \
+                            database is skipped, and the result of a new run \
+                            is recorded. Default: None.')
+    parser.add_argument('--resume',
+                        required=False,
+                        default=False,
+                        action='store_true',
+                        help='whether to resume the run from the final \
+                            configuration of a shorter run of the same \
+                            parameters found in the database (-d). Specify \
+                            "--resume" to resume.')
 
-    args_parse = parser.parse_args()
+    args_parse = parser.parse_args(argv)
 
     return args_parse
 
 
-if __name__ == "__main__":
-    rc('font', **{
-        'family': 'sans-serif',
-        'sans-serif': ['DejaVu Sans'],
-        'size': 10
-    })
-    # Set the font used for MathJax - more on this later
-    rc('mathtext', **{'default': 'regular'})
-    plt.rc('font', family='serif')
-
-    args = initialize()
-    new_system = SystemSetup(N_particles=args.N_particles,
-                             reduced_rho=args.reduced_rho)
-    energy = energy.Energy()
-    sim = MonteCarlo(system=new_system, energy=energy, args=args)
+def run(config=None):
+    """
+    A function for performing a Monte Carlo simulation in-process, which is
+    the programmatic equivalent of executing monte_carlo.py.
+
+    Parameters
+    ----------
+    config : dict or argparse.Namespace
+        The parameters of the simulation named after the long flags of the
+        command-line interface, e.g. {'N_particles': 100, 'n_steps': 5000,
+        'seed': 1, 'traj_file': None, 'quiet': True}. The parameters not
+        specified take the defaults of the command-line interface. No
+        trajectory data file is written if traj_file is None.
+
+    Returns
+    -------
+    results : dict
+        The results of the simulation, including the adopted parameters
+        ('config'), the total energy per particle at every step ('energy'),
+        a summary of the energy series ('summary', see
+        result_store.summarize), the final coordinates ('coordinates'), the
+        box length ('box_length'), the final maximum displacement ('max_d'),
+        the wall time of the simulation in seconds ('wall_time'), the
+        statistics of the energy cache ('cache_stats', see
+        energy.Energy.cache_stats), the state of the random number
+        generator at the end of the run ('rng_state'), the id of the run in
+        the database ('run_id'), the id of the run it was resumed from
+        ('resumed_from') and whether the results were found in the database
+        ('cached'). The energy series of cached results is not available
+        (None). The energy series (and summary) of a resumed run only cover
+        the steps performed after resuming, and a resumed run is only
+        served from the database to lookups with resume enabled.
+    """
+    args = initialize([])
+    if config is not None:
+        if isinstance(config, argparse.Namespace):
+            config = vars(config)
+        unknown = set(config) - set(vars(args))
+        if unknown:
+            raise ValueError('Unknown parameters: %s' %
+                             ', '.join(sorted(unknown)))
+        vars(args).update(config)
+    adopted = dict(vars(args))   # max_d is adjusted during the simulation
+
+    store = None
+    if args.db is not None:
+        store = result_store.ResultStore(args.db)
+    try:
+        return _run(args, adopted, store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _run(args, adopted, store=None):
+    """
+    Performs the simulation of run(), looking it up in (and recording it
+    to) the ResultStore store if specified.
+    """
+    resumed = None
+    if store is not None:
+        cached = store.fetch(args)
+        if cached is None and args.resume:
+            resumed = store.find_resumable(args)
+            if resumed is not None:
+                cached = store.fetch(args, resumed['run_id'])
+        if cached is not None:
+            if not args.quiet:
+                print('Found run %s in %s: %s +/- %s' % (
+                    cached['run_id'], args.db, cached['summary']['e_mean'],
+                    cached['summary']['e_sem']))
+            return cached
+
+    start = time.perf_counter()
+    if resumed is None:
+        rng = np.random.default_rng(args.seed)
+        system = SystemSetup(N_particles=args.N_particles,
+                             reduced_rho=args.reduced_rho, rng=rng)
+    else:
+        # continue the random number stream of the resumed run instead of
+        # replaying it from the seed
+        rng = np.random.default_rng()
+        rng.bit_generator.state = resumed['rng_state']
+        system = SystemSetup(N_particles=args.N_particles,
+                             reduced_rho=args.reduced_rho,
+                             coordinates=resumed['coordinates'])
+        args.max_d = resumed['max_d']
+        args.n_steps -= resumed['config']['n_steps']
+        if not args.quiet:
+            print('Resuming run %s after %s steps\n' % (
+                resumed['run_id'], resumed['config']['n_steps']))
+    ener = energy.Energy(args.energy, simulation_cutoff=args.cutoff,
+                         cache_size=args.cache_size,
+                         cache_tolerance=args.cache_tolerance)
+    sim = MonteCarlo(system=system, energy=ener, args=args, rng=rng)
     sim.MC_simulation()
+    wall_time = time.perf_counter() - start
+
+    results = {'config': adopted,
+               'energy': sim.energy_array,
+               'summary': result_store.summarize(sim.energy_array),
+               'coordinates': sim.coordinates,
+               'box_length': sim.box_length,
+               'max_d': args.max_d,
+               'wall_time': wall_time,
+               'cache_stats': ener.cache_stats(),
+               'rng_state': rng.bit_generator.state,
+               'run_id': None,
+               'resumed_from': None,
+               'cached': False}
+    if resumed is not None:
+        results['resumed_from'] = resumed['run_id']
+
+    if store is not None:
+        results['run_id'] = store.save(results, results['resumed_from'])
+
+    return results
+
+
+if __name__ == "__main__":
+    run(initialize())
     sys.exit(0)
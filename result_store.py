@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+
+# parameters of monte_carlo.initialize() that only control the output or
+# the speed and therefore do not change the result of a simulation (unlike
+# cache_size, cache_tolerance changes the energies and stays in the key)
+OUTPUT_OPTIONS = ('freq_ener', 'freq_traj', 'plot', 'traj_file', 'quiet',
+                  'db', 'resume', 'cache_size')
+
+# the source files whose content defines the version of the code
+SOURCE_FILES = ('energy.py', 'monte_carlo.py')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    state_key TEXT,
+    code_version TEXT,
+    energy TEXT,
+    N_particles INTEGER,
+    reduced_T REAL,
+    reduced_rho REAL,
+    cutoff REAL,
+    n_steps INTEGER,
+    seed INTEGER,
+    config TEXT,
+    e_mean REAL,
+    e_sem REAL,
+    e_final REAL,
+    n_average INTEGER,
+    block_means BLOB,
+    coordinates BLOB,
+    box_length REAL,
+    max_d REAL,
+    wall_time REAL,
+    resumed_from INTEGER,
+    rng_state TEXT,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS state_point ON runs
+    (energy, N_particles, reduced_rho, reduced_T);
+CREATE INDEX IF NOT EXISTS resumable ON runs (state_key, n_steps);
+"""
+
+# the columns returned by ResultStore.query (no arrays)
+SUMMARY_COLUMNS = ('id', 'code_version', 'energy', 'N_particles', 'reduced_T',
+                   'reduced_rho', 'cutoff', 'n_steps', 'seed', 'e_mean',
+                   'e_sem', 'e_final', 'n_average', 'box_length', 'max_d',
+                   'wall_time', 'resumed_from', 'created')
+
+
+def code_version():
+    """
+    Returns a short hash of the source files of the simulation, so that the
+    results of a modified code are never mistaken for cached ones.
+    """
+    sha = hashlib.sha1()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_FILES:
+        with open(os.path.join(root, name), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:12]
+
+
+def summarize(energy, n_blocks=100, n_equil=None):
+    """
+    Summarizes an energy series of a simulation. The first n_equil steps
+    are discarded as equilibration and the statistical error of the mean
+    of the rest is estimated from 10 block averages.
+
+    Parameters
+    ----------
+    energy : np.array
+        The total energy per particle at every Monte Carlo step
+    n_blocks : int
+        The number of block averages of the whole series kept for plotting
+        (default: 100)
+    n_equil : int
+        The number of equilibration steps (default: None, the first half
+        of the series)
+
+    Returns
+    -------
+    summary : dict
+        The mean ('e_mean') and its standard error ('e_sem') of the series
+        after equilibration, the number of steps averaged ('n_average'),
+        the final energy ('e_final') and the block averages of the whole
+        series ('block_means').
+    """
+    energy = np.asarray(energy, dtype=float)
+    if n_equil is None:
+        n_equil = len(energy) // 2
+    if not 0 <= n_equil < len(energy):
+        raise ValueError('n_equil should be smaller than the number of '
+                         'steps (%s).' % len(energy))
+    production = energy[n_equil:]
+    blocks = [b.mean() for b in np.array_split(production, 10) if len(b)]
+    if len(blocks) > 1:
+        e_sem = float(np.std(blocks, ddof=1) / np.sqrt(len(blocks)))
+    else:
+        e_sem = float('nan')
+    block_means = np.array([b.mean() for b in np.array_split(
+        energy, min(n_blocks, len(energy))) if len(b)])
+
+    summary = {'e_mean': float(production.mean()),
+               'e_sem': e_sem,
+               'e_final': float(energy[-1]),
+               'n_average': len(production),
+               'block_means': block_means}
+
+    return summary
+
+
+class ResultStore:
+    def __init__(self, path: str = 'results.db'):
+        """
+        A SQLite database of simulation results. Each run is keyed by all
+        the parameters of monte_carlo.initialize() that affect the result
+        (including the seed) and by the version of the code.
+
+        Parameters
+        ----------
+        path : str
+            The file name of the database (default: 'results.db')
+        """
+        self.path = path
+        self.version = code_version()
+        # a generous timeout since parallel sweeps share the same file
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _params(self, config):
+        """
+        Returns the parameters of a configuration (a dict or an
+        argparse.Namespace) that affect the result.
+        """
+        if not isinstance(config, dict):
+            config = vars(config)
+        return {k: v for k, v in sorted(config.items())
+                if k not in OUTPUT_OPTIONS}
+
+    def _hash(self, params):
+        text = json.dumps([params, self.version], sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def key(self, config, resumed_from=None):
+        """
+        Returns the key of a configuration, which is None for unseeded
+        (i.e. not reproducible) runs. A run resumed from another one is
+        keyed separately (by the id of that run), since its results differ
+        from those of a fresh run of the same configuration.
+        """
+        params = self._params(config)
+        if params.get('seed') is None:
+            return None
+        if resumed_from is not None:
+            params['resumed_from'] = resumed_from
+        return self._hash(params)
+
+    def state_key(self, config):
+        """
+        Returns the key of a configuration regardless of n_steps, which
+        identifies the runs that a longer run can be resumed from.
+        """
+        params = self._params(config)
+        if params.get('seed') is None:
+            return None
+        params.pop('n_steps', None)
+        return self._hash(params)
+
+    def save(self, results, resumed_from=None):
+        """
+        Records the results returned by monte_carlo.run. An existing run
+        with the same key is updated in place, keeping its id (which the
+        runs resumed from it refer to).
+
+        Parameters
+        ----------
+        results : dict
+            The results returned by monte_carlo.run
+        resumed_from : int
+            The id of the run that this run was resumed from, if any
+
+        Returns
+        -------
+        run_id : int
+            The id of the recorded run
+        """
+        config = results['config']
+        params = self._params(config)
+        summary = results['summary']
+        row = {'key': self.key(config, resumed_from),
+               'state_key': self.state_key(config),
+               'code_version': self.version,
+               'energy': params['energy'],
+               'N_particles': params['N_particles'],
+               'reduced_T': params['reduced_T'],
+               'reduced_rho': params['reduced_rho'],
+               'cutoff': params['cutoff'],
+               'n_steps': params['n_steps'],
+               'seed': params['seed'],
+               'config': json.dumps(params),
+               'e_mean': summary['e_mean'],
+               'e_sem': summary['e_sem'],
+               'e_final': summary['e_final'],
+               'n_average': summary['n_average'],
+               'block_means': np.asarray(
+                   summary['block_means'], dtype=np.float64).tobytes(),
+               'coordinates': np.asarray(
+                   results['coordinates'], dtype=np.float64).tobytes(),
+               'box_length': results['box_length'],
+               'max_d': results['max_d'],
+               'wall_time': results['wall_time'],
+               'resumed_from': resumed_from,
+               'rng_state': json.dumps(results['rng_state']),
+               'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO runs (%s) VALUES (%s) ON CONFLICT(key) DO '
+                'UPDATE SET %s' % (
+                    ', '.join(row), ', '.join('?' * len(row)),
+                    ', '.join('%s = excluded.%s' % (k, k) for k in row)),
+                list(row.values()))
+            if row['key'] is None:
+                return cursor.lastrowid
+            run_id = self.conn.execute('SELECT id FROM runs WHERE key = ?',
+                                       (row['key'],)).fetchone()['id']
+
+        return run_id
+
+    def _to_results(self, row):
+        """
+        Converts a row of the database to the format of the results of
+        monte_carlo.run. The full energy series is not stored, so 'energy'
+        is None.
+        """
+        summary = {k: row[k] for k in ('e_mean', 'e_sem', 'e_final',
+                                       'n_average')}
+        summary['block_means'] = np.frombuffer(row['block_means'])
+        results = {'config': json.loads(row['config']),
+                   'energy': None,
+                   'summary': summary,
+                   'coordinates': np.frombuffer(
+                       row['coordinates']).reshape(-1, 3).copy(),
+                   'box_length': row['box_length'],
+                   'max_d': row['max_d'],
+                   'wall_time': row['wall_time'],
+                   'cache_stats': None,
+                   'rng_state': json.loads(row['rng_state'] or 'null'),
+                   'run_id': row['id'],
+                   'resumed_from': row['resumed_from'],
+                   'cached': True}
+
+        return results
+
+    def fetch(self, config, resumed_from=None):
+        """
+        Returns the cached results of a configuration, or None if the
+        configuration has not been run (or is unseeded). Runs resumed from
+        another run are only returned if its id is given as resumed_from.
+        """
+        key = self.key(config, resumed_from)
+        if key is None:
+            return None
+        row = self.conn.execute('SELECT * FROM runs WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            return None
+        return self._to_results(row)
+
+    def find_resumable(self, config):
+        """
+        Returns the cached results of the longest run of the same
+        configuration with fewer steps than requested, or None. Fresh runs
+        are preferred over resumed ones of the same length.
+        """
+        state_key = self.state_key(config)
+        if state_key is None:
+            return None
+        n_steps = self._params(config)['n_steps']
+        row = self.conn.execute(
+            'SELECT * FROM runs WHERE state_key = ? AND n_steps < ? AND '
+            'rng_state IS NOT NULL ORDER BY n_steps DESC, '
+            'resumed_from IS NOT NULL LIMIT 1',
+            (state_key, n_steps)).fetchone()
+        if row is None:
+            return None
+        return self._to_results(row)
+
+    def query(self, current_version=True, include_resumed=False,
+              **filters):
+        """
+        Returns the summaries of the recorded runs (without the arrays),
+        ordered by the reduced temperature, e.g. for plotting the energy as
+        a function of temperature:
+        store.query(energy='UnitlessLJ', N_particles=500, reduced_rho=0.9)
+
+        Parameters
+        ----------
+        current_version : bool
+            Whether to only return the runs of the current code version
+            (default: True)
+        include_resumed : bool
+            Whether to also return the resumed runs, whose statistics only
+            cover the steps performed after resuming (default: False)
+        **filters
+            The required values of the columns, e.g. reduced_rho=0.9
+
+        Returns
+        -------
+        rows : list of dict
+            The summaries of the matching runs
+        """
+        unknown = set(filters) - set(SUMMARY_COLUMNS)
+        if unknown:
+            raise ValueError('Unknown columns: %s' %
+                             ', '.join(sorted(unknown)))
+        if current_version:
+            filters['code_version'] = self.version
+        conditions = ['%s = ?' % k for k in filters]
+        if not include_resumed:
+            conditions.append('resumed_from IS NULL')
+        where = ' AND '.join(conditions) or '1'
+        rows = self.conn.execute(
+            'SELECT %s FROM runs WHERE %s ORDER BY reduced_T, id' % (
+                ', '.join(SUMMARY_COLUMNS), where), list(filters.values()))
+
+        return [dict(row) for row in rows]
@@ -0,0 +1,11 @@
+#!/bin/bash
+
+test -e ssshtest || wget https://raw.githubusercontent.com/ryanlayer/ssshtest/master/ssshtest
+. ssshtest
+
+run test_style pycodestyle benchmark_energy.py
+assert_no_stdout
+
+run test_benchmark python3 benchmark_energy.py -N 50 -r 1
+assert_in_stdout "ns/pair"
+assert_exit_code 0
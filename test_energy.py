@@ -24,7 +24,8 @@ class TestEnergyModels(unittest.TestCase):
     def test_LennardJones(self):
         # create a model with default paramters
         model = energy.LennardJones()
-        energy_2 = model.calc_energy(2)
+        # calc_energy takes the squared distance, i.e. r = 2
+        energy_2 = model.calc_energy(4)
         self.assertAlmostEqual(energy_2, -0.03076171875)
         self.assertEqual(model.cutoff_correction(), 0)
 
@@ -50,7 +51,109 @@ class TestEnergyModels(unittest.TestCase):
         model = energy.Energy('LJ')
         coord = np.array([[1, 2, 3], [0, 0, 0]])
         energy_1 = model.calc_init_ener(coord, 3)
-        self.assertEqual(energy_1, -0.2187499999999999)
+        self.assertAlmostEqual(energy_1, -0.21875)
+
+    def test_calc_energy_array(self):
+        r2 = np.array([0.9, 1.0, 1.5, 4.0, 8.0])
+        for model in [energy.LennardJones(), energy.Buckingham(),
+                      energy.UnitlessLennardJones()]:
+            expected = [model.calc_energy(float(x)) for x in r2]
+            np.testing.assert_allclose(model.calc_energy(r2), expected)
+
+    def test_calc_pair_ener(self):
+        np.random.seed(2019)
+        box_length = 4.0
+        coord = (0.5 - np.random.rand(20, 3)) * box_length
+        np.random.seed()
+        model = energy.Energy(simulation_cutoff=1.8)
+        # brute-force reference with explicit distances
+        expected = 0.0
+        for j in range(1, 20):
+            rij = coord[0] - coord[j]
+            rij -= box_length * np.round(rij / box_length)
+            r = np.sqrt(np.dot(rij, rij))
+            if r < 1.8:
+                expected += 4.0 * (r ** -12 - r ** -6)
+        self.assertAlmostEqual(model.calc_pair_ener(coord, box_length, 0),
+                               expected)
+        # the total energy counts every pair once
+        pair_sum = sum(model.calc_pair_ener(coord, box_length, i)
+                       for i in range(20))
+        self.assertAlmostEqual(model.calc_init_ener(coord, box_length),
+                               pair_sum / 2)
+
+
+class TestEnergyCache(unittest.TestCase):
+    def test_init(self):
+        self.assertRaises(ValueError, energy.EnergyCache, 0)
+        self.assertRaises(ValueError, energy.EnergyCache, 10, -1.0)
+
+    def test_lru(self):
+        cache = energy.EnergyCache(max_entries=2)
+        calls = []
+
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual(cache.lookup(1.0, square), 1.0)
+        self.assertEqual(cache.lookup(2.0, square), 4.0)
+        self.assertEqual(cache.lookup(1.0, square), 1.0)   # hit
+        self.assertEqual(cache.lookup(3.0, square), 9.0)   # evicts 2.0
+        self.assertEqual(list(cache.entries), [1.0, 3.0])
+        self.assertEqual(cache.lookup(2.0, square), 4.0)   # evicts 1.0
+        self.assertEqual(calls, [1.0, 2.0, 3.0, 2.0])
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 4)
+        self.assertEqual(stats['evictions'], 2)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['hit_rate'], 0.2)
+        cache.clear()
+        self.assertEqual(cache.stats()['hits'], 0)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_tolerance(self):
+        cache = energy.EnergyCache(tolerance=0.1)
+        self.assertAlmostEqual(cache.lookup(1.02, lambda x: x), 1.0)
+        self.assertAlmostEqual(cache.lookup(0.97, lambda x: x), 1.0)
+        self.assertAlmostEqual(cache.lookup(1.06, lambda x: x), 1.1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        # not rounded to 0 below one tolerance step
+        self.assertEqual(cache.lookup(0.04, lambda x: x), 0.04)
+        self.assertEqual(cache.lookup(0.09, lambda x: x), 0.09)
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['entries'], 2)
+        model = energy.CachedEnergyModel(energy.UnitlessLennardJones(),
+                                         tolerance=0.1)
+        self.assertAlmostEqual(model.calc_energy(0.04),
+                               energy.UnitlessLennardJones().calc_energy(0.04))
+
+    def test_cached_energy(self):
+        np.random.seed(2019)
+        coord = (0.5 - np.random.rand(20, 3)) * 4.0
+        np.random.seed()
+        for potential_type in ['UnitlessLJ', 'LJ', 'Buckingham']:
+            exact = energy.Energy(potential_type)
+            cached = energy.Energy(potential_type, cache_size=1000)
+            self.assertIsNone(exact.cache_stats())
+            self.assertIsInstance(cached.energy_obj,
+                                  energy.CachedEnergyModel)
+            for i in range(20):
+                self.assertAlmostEqual(exact.calc_pair_ener(coord, 4.0, i),
+                                       cached.calc_pair_ener(coord, 4.0, i))
+            # every pair is visited twice
+            stats = cached.cache_stats()
+            self.assertEqual(stats['hits'], stats['misses'])
+            self.assertEqual(cached.calc_tail(20, 4.0),
+                             exact.calc_tail(20, 4.0))
+
+        # a tolerance without a cache would not change the energies
+        self.assertRaises(ValueError, energy.Energy, cache_tolerance=0.1)
+
+        model = energy.CachedEnergyModel(energy.UnitlessLennardJones(), 10)
+        self.assertEqual(model.calc_energy(1.0), 0)
+        self.assertEqual(model.calc_energy(np.array([])).shape, (0,))
 
 
 if __name__ == '__main__':
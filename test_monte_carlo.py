@@ -1,3 +1,9 @@
+import os
+import io
+import copy
+import tempfile
+import contextlib
+from unittest import mock
 import numpy as np
 import energy
 import unittest
@@ -18,7 +24,7 @@ class TestMonteCarlo(unittest.TestCase):
         # should be [-3.31690899,  0.87895379, -1.01912071]
         cls.sys_obj = monte_carlo.SystemSetup()
         cls.energy = energy.Energy()
-        cls.parser = monte_carlo.initialize()
+        cls.parser = monte_carlo.initialize([])
         cls.sim = monte_carlo.MonteCarlo(
             cls.sys_obj, cls.energy, cls.parser)
         np.random.seed()
@@ -49,6 +55,18 @@ class TestMonteCarlo(unittest.TestCase):
         self.assertEqual(self.parser.freq_traj, 1000)
         self.assertEqual(self.parser.max_d, 0.1)
         self.assertEqual(self.parser.energy, 'UnitlessLJ')
+        self.assertIsNone(self.parser.seed)
+        self.assertFalse(self.parser.quiet)
+        self.assertEqual(self.parser.cutoff, 3.0)
+        self.assertIsNone(self.parser.db)
+        self.assertFalse(self.parser.resume)
+        self.assertIsNone(self.parser.cache_size)
+        self.assertIsNone(self.parser.cache_tolerance)
+
+        args = monte_carlo.initialize(['-N', '10', '-s', '3', '-q'])
+        self.assertEqual(args.N_particles, 10)
+        self.assertEqual(args.seed, 3)
+        self.assertTrue(args.quiet)
 
     def test_metropolis_mc(self):
         a = self.sim.metropolis_mc(-1, 0)
@@ -56,11 +74,208 @@ class TestMonteCarlo(unittest.TestCase):
         b = self.sim.metropolis_mc(10, 1)
         self.assertFalse(b)
 
+    def test_metropolis_mc_uniform(self):
+        # p_acc = exp(-1) = 0.3679
+        self.assertTrue(self.sim.metropolis_mc(1, 1, 0.3))
+        self.assertFalse(self.sim.metropolis_mc(1, 1, 0.4))
+
+    def test_draw_random_block(self):
+        sim = monte_carlo.MonteCarlo(self.sys_obj, self.energy, self.parser,
+                                     block_size=100)
+        i_particles, displacements, uniforms = sim.draw_random_block()
+        self.assertEqual(i_particles.shape, (100,))
+        self.assertEqual(displacements.shape, (100, 3))
+        self.assertEqual(uniforms.shape, (100,))
+        self.assertTrue(np.all((i_particles >= 0) & (i_particles < 500)))
+        self.assertTrue(np.all(np.abs(displacements) <= 1))
+        self.assertTrue(np.all((uniforms >= 0) & (uniforms < 1)))
+        # never more than needed by the remaining steps, nor than block_size
+        self.assertEqual(len(sim.draw_random_block(30)[0]), 30)
+        self.assertEqual(sim.draw_random_block(30)[1].shape, (30, 3))
+        self.assertEqual(len(sim.draw_random_block(1000)[2]), 100)
+
+    def run_seeded(self, seed, block_size=64):
+        args = copy.copy(self.parser)
+        args.N_particles, args.n_steps, args.seed = 10, 300, seed
+        args.traj_file = os.path.join(tempfile.mkdtemp(), 'test.xyz')
+        system = monte_carlo.SystemSetup(10, 0.9,
+                                         rng=np.random.default_rng(seed))
+        sim = monte_carlo.MonteCarlo(system, energy.Energy(), args,
+                                     block_size=block_size)
+        # the moves continue the stream that placed the particles
+        self.assertIs(sim.rng, system.rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.MC_simulation()
+        os.remove(args.traj_file)
+        return sim.energy_array
+
+    def test_seed_reproducibility(self):
+        np.testing.assert_array_equal(self.run_seeded(42),
+                                      self.run_seeded(42))
+        self.assertFalse(np.array_equal(self.run_seeded(42),
+                                        self.run_seeded(43)))
+
     def test_adjust_moves(self):
-        a, b, c = self.sim.adjust_moves(10, 10, 10)
-        self.assertEqual(a, 12.0)
+        a, b, c = self.sim.adjust_moves(1, 10, 10)
+        self.assertEqual(a, 1.2)
         self.assertEqual(b, 0)
         self.assertEqual(c, 0)
+        a, b, c = self.sim.adjust_moves(1, 1, 10)
+        self.assertEqual(a, 0.8)
+        # capped at half of the box length
+        a, b, c = self.sim.adjust_moves(10, 10, 10)
+        self.assertEqual(a, self.sim.box_length / 2)
+
+    def test_OutputWriter(self):
+        traj_file = os.path.join(tempfile.mkdtemp(), 'test.xyz')
+        writer = monte_carlo.OutputWriter(traj_file, max_queued=1)
+        writer.start()
+        coords = np.array([[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]])
+        writer.submit(writer.write_frame, 1, coords.copy())
+        coords += 1    # the queued snapshot should not be affected
+        writer.submit(writer.write_frame, 2, coords.copy())
+        writer.close()
+        with open(traj_file) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(lines[0], '2\n')
+        self.assertEqual(lines[1], 'Step: 1 \n')
+        self.assertEqual(lines[2].split(), ['Ar', '0.0', '1.0', '2.0'])
+        self.assertEqual(lines[7].split(), ['Ar', '4.0', '5.0', '6.0'])
+        os.remove(traj_file)
+
+    def test_OutputWriter_error(self):
+        traj_file = os.path.join(tempfile.mkdtemp(), 'test.xyz')
+        writer = monte_carlo.OutputWriter(traj_file)
+        writer.start()
+        writer.submit(int, 'abc')
+        self.assertRaises(ValueError, writer.close)
+        os.remove(traj_file)
+
+        # the error is reported by the next submit, and only once
+        writer = monte_carlo.OutputWriter(traj_file)
+        writer.start()
+        writer.submit(int, 'abc')
+        writer.jobs.join()
+        self.assertRaises(ValueError, writer.submit, print, 'abc')
+        writer.close()
+        os.remove(traj_file)
+
+    def test_MC_simulation_writer_error(self):
+        args = copy.copy(self.parser)
+        args.N_particles, args.n_steps, args.freq_traj = 10, 500, 1
+        args.traj_file = os.path.join(tempfile.mkdtemp(), 'test.xyz')
+        system = monte_carlo.SystemSetup(10, 0.9)
+        sim = monte_carlo.MonteCarlo(system, energy.Energy(), args)
+        error = OSError('No space left on device')
+        with mock.patch.object(monte_carlo.OutputWriter, 'write_frame',
+                               side_effect=error):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertRaises(OSError, sim.MC_simulation)
+        self.assertFalse(hasattr(sim, 'energy_array'))
+        os.remove(args.traj_file)
+
+    def test_plot_configuration(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'test.png')
+        coords = np.array([[0.0, 1.0, 2.0], [-1.0, -2.0, 0.5]])
+        self.sim.plot_configuration(coords, 'Test configuration', filename)
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+        os.remove(filename)
+
+    def test_run(self):
+        config = {'N_particles': 10, 'n_steps': 200, 'seed': 1,
+                  'traj_file': None, 'quiet': True}
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            results = monte_carlo.run(config)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(results['config']['N_particles'], 10)
+        self.assertEqual(results['config']['max_d'], 0.1)
+        self.assertEqual(results['energy'].shape, (200,))
+        self.assertEqual(results['coordinates'].shape, (10, 3))
+        self.assertGreater(results['wall_time'], 0)
+        self.assertIsNone(results['cache_stats'])
+        config['cache_size'] = 100
+        cached = monte_carlo.run(config)
+        self.assertEqual(cached['cache_stats']['max_entries'], 100)
+        np.testing.assert_allclose(cached['energy'], results['energy'])
+        del config['cache_size']
+        np.testing.assert_array_equal(monte_carlo.run(config)['energy'],
+                                      results['energy'])
+        self.assertRaises(ValueError, monte_carlo.run, {'n_step': 10})
+
+    def test_run_db(self):
+        db = os.path.join(tempfile.mkdtemp(), 'test.db')
+        config = {'N_particles': 10, 'n_steps': 200, 'seed': 1,
+                  'traj_file': None, 'quiet': True, 'db': db}
+        results = monte_carlo.run(config)
+        self.assertFalse(results['cached'])
+        cached = monte_carlo.run(config)
+        self.assertTrue(cached['cached'])
+        self.assertEqual(cached['run_id'], results['run_id'])
+        self.assertEqual(cached['summary']['e_mean'],
+                         results['summary']['e_mean'])
+        np.testing.assert_array_equal(cached['coordinates'],
+                                      results['coordinates'])
+
+        np.testing.assert_array_equal(cached['rng_state']['state']['state'],
+                                      results['rng_state']['state']['state'])
+        os.remove(db)
+
+    def test_run_db_resume(self):
+        db = os.path.join(tempfile.mkdtemp(), 'test.db')
+        config = {'N_particles': 10, 'n_steps': 1000, 'seed': 1,
+                  'traj_file': None, 'quiet': True, 'db': db}
+        first = monte_carlo.run(config)
+
+        config['n_steps'], config['resume'] = 2000, True
+        resumed = monte_carlo.run(config)
+        self.assertFalse(resumed['cached'])
+        self.assertEqual(resumed['resumed_from'], first['run_id'])
+        self.assertEqual(resumed['config']['n_steps'], 2000)
+        self.assertEqual(resumed['energy'].shape, (1000,))
+        # the random numbers continue the stream of the first run instead
+        # of replaying it from the seed
+        rng = np.random.default_rng()
+        rng.bit_generator.state = first['rng_state']
+        rng.integers(10, size=1000)
+        rng.random((1000, 3))
+        rng.random(1000)
+        self.assertEqual(rng.bit_generator.state, resumed['rng_state'])
+        self.assertEqual(monte_carlo.run(config)['run_id'],
+                         resumed['run_id'])
+
+        # a resumed run is never served to a lookup without resume
+        config['resume'] = False
+        fresh = monte_carlo.run(config)
+        self.assertFalse(fresh['cached'])
+        self.assertIsNone(fresh['resumed_from'])
+        self.assertEqual(fresh['summary']['n_average'], 1000)
+        self.assertTrue(monte_carlo.run(config)['cached'])
+        self.assertEqual(monte_carlo.run(config)['run_id'], fresh['run_id'])
+        # and a fresh run is preferred over a resumed one
+        config['resume'] = True
+        self.assertEqual(monte_carlo.run(config)['run_id'], fresh['run_id'])
+        os.remove(db)
+
+    def test_run_db_error(self):
+        db = os.path.join(tempfile.mkdtemp(), 'test.db')
+        closed = []
+        close = monte_carlo.result_store.ResultStore.close
+
+        def spy_close(store):
+            closed.append(store.path)
+            close(store)
+
+        config = {'N_particles': 10, 'n_steps': 200, 'seed': 1,
+                  'traj_file': None, 'quiet': True, 'db': db,
+                  'energy': 'unknown'}
+        with mock.patch.object(monte_carlo.result_store.ResultStore,
+                               'close', spy_close):
+            self.assertRaises(KeyError, monte_carlo.run, config)
+        # the database is closed even if the simulation fails
+        self.assertEqual(closed, [db])
+        os.remove(db)
 
     def test_MC_simulation(self):
         self.assertTrue(self.sim.MC_simulation)
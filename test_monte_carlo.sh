@@ -13,3 +13,10 @@ run test_few_particles python3 monte_carlo.py --N_particles 10 --n_steps 10000 -
 assert_stdout
 assert_exit_code 0
 rm test.xyz
+
+echo "...plotting..."
+run test_plot python3 monte_carlo.py --N_particles 10 --n_steps 1000 --traj_file test.xyz -p
+assert_exit_code 0
+run test_plot_files ls structure_initial.png structure_final.png
+assert_exit_code 0
+rm test.xyz structure_initial.png structure_final.png
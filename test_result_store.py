@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import result_store
+
+
+def fake_results(n_steps=100, seed=1, reduced_T=0.9):
+    config = {'N_particles': 4, 'reduced_T': reduced_T, 'reduced_rho': 0.9,
+              'n_steps': n_steps, 'freq_ener': 10, 'freq_traj': 10,
+              'max_d': 0.1, 'energy': 'UnitlessLJ', 'cutoff': 3.0,
+              'plot': False, 'traj_file': None, 'seed': seed, 'quiet': True,
+              'db': 'test.db', 'resume': False}
+    energy = np.linspace(-1.0, -2.0, n_steps)
+    results = {'config': config,
+               'energy': energy,
+               'summary': result_store.summarize(energy),
+               'coordinates': np.arange(12, dtype=float).reshape(4, 3),
+               'box_length': 1.6,
+               'max_d': 0.2,
+               'wall_time': 0.5,
+               'rng_state': np.random.default_rng(0).bit_generator.state}
+    return results
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.db = os.path.join(tempfile.mkdtemp(), 'test.db')
+        self.store = result_store.ResultStore(self.db)
+
+    def tearDown(self):
+        self.store.close()
+        os.remove(self.db)
+
+    def test_code_version(self):
+        self.assertEqual(len(result_store.code_version()), 12)
+        self.assertEqual(self.store.version, result_store.code_version())
+
+    def test_summarize(self):
+        summary = result_store.summarize(np.arange(200.0), n_blocks=10)
+        self.assertEqual(summary['e_mean'], 149.5)
+        self.assertEqual(summary['e_final'], 199.0)
+        self.assertEqual(summary['n_average'], 100)
+        self.assertAlmostEqual(summary['e_sem'], np.sqrt(10 * 11 / 12) *
+                               10 / np.sqrt(10))
+        self.assertEqual(len(summary['block_means']), 10)
+        self.assertEqual(summary['block_means'][0], 9.5)
+
+        summary = result_store.summarize(np.arange(200.0), n_equil=150)
+        self.assertEqual(summary['e_mean'], 174.5)
+        self.assertEqual(summary['n_average'], 50)
+        self.assertRaises(ValueError, result_store.summarize,
+                          np.arange(200.0), n_equil=200)
+
+    def test_key(self):
+        config = fake_results()['config']
+        key = self.store.key(config)
+        # the output options do not change the key
+        config['traj_file'], config['freq_ener'] = 'test.xyz', 1
+        self.assertEqual(self.store.key(config), key)
+        # neither does the size of the energy cache, unlike its tolerance
+        config['cache_size'] = 1000
+        self.assertEqual(self.store.key(config), key)
+        config['cache_tolerance'] = 1e-6
+        self.assertNotEqual(self.store.key(config), key)
+        config = fake_results()['config']
+        config['reduced_T'] = 1.0
+        self.assertNotEqual(self.store.key(config), key)
+        # n_steps only changes the key, not the state key
+        config = fake_results()['config']
+        config['n_steps'] = 200
+        self.assertNotEqual(self.store.key(config), key)
+        self.assertEqual(self.store.state_key(config),
+                         self.store.state_key(fake_results()['config']))
+        # unseeded runs are not reproducible
+        config['seed'] = None
+        self.assertIsNone(self.store.key(config))
+        self.assertIsNone(self.store.state_key(config))
+
+    def test_save_fetch(self):
+        results = fake_results()
+        self.assertIsNone(self.store.fetch(results['config']))
+        run_id = self.store.save(results)
+        cached = self.store.fetch(results['config'])
+        self.assertEqual(cached['run_id'], run_id)
+        self.assertTrue(cached['cached'])
+        self.assertIsNone(cached['energy'])
+        self.assertEqual(cached['config']['n_steps'], 100)
+        self.assertEqual(cached['summary']['e_mean'],
+                         results['summary']['e_mean'])
+        np.testing.assert_array_equal(cached['summary']['block_means'],
+                                      results['summary']['block_means'])
+        np.testing.assert_array_equal(cached['coordinates'],
+                                      results['coordinates'])
+        self.assertEqual(cached['max_d'], 0.2)
+        self.assertEqual(cached['rng_state'], results['rng_state'])
+        self.assertIsNone(cached['resumed_from'])
+
+        # saving the same key again updates the run and keeps its id, which
+        # the runs resumed from it refer to
+        resumed_id = self.store.save(fake_results(n_steps=200), run_id)
+        results['summary']['e_mean'] = -5.0
+        self.assertEqual(self.store.save(results), run_id)
+        self.assertEqual(self.store.fetch(results['config'])['summary'][
+            'e_mean'], -5.0)
+        self.assertEqual(self.store.fetch(fake_results(n_steps=200)[
+            'config'], run_id)['run_id'], resumed_id)
+        self.assertEqual(len(self.store.query(include_resumed=True)), 2)
+
+        # unseeded runs are recorded but never fetched
+        results = fake_results(seed=None)
+        self.store.save(results)
+        self.assertIsNone(self.store.fetch(results['config']))
+        self.assertEqual(len(self.store.query()), 2)
+
+    def test_find_resumable(self):
+        self.store.save(fake_results(n_steps=100))
+        run_id = self.store.save(fake_results(n_steps=200))
+        self.store.save(fake_results(n_steps=200, seed=2))
+        config = fake_results(n_steps=300)['config']
+        self.assertEqual(self.store.find_resumable(config)['run_id'], run_id)
+        config['n_steps'] = 100
+        self.assertIsNone(self.store.find_resumable(config))
+
+    def test_resumed(self):
+        run_id = self.store.save(fake_results(n_steps=100))
+        results = fake_results(n_steps=200)
+        self.assertNotEqual(self.store.key(results['config'], run_id),
+                            self.store.key(results['config']))
+        resumed_id = self.store.save(results, resumed_from=run_id)
+        # resumed runs are only fetched by the id they were resumed from
+        self.assertIsNone(self.store.fetch(results['config']))
+        cached = self.store.fetch(results['config'], run_id)
+        self.assertEqual(cached['run_id'], resumed_id)
+        self.assertEqual(cached['resumed_from'], run_id)
+        # and are left out of the queries by default
+        self.assertEqual([row['id'] for row in self.store.query()], [run_id])
+        self.assertEqual(len(self.store.query(include_resumed=True)), 2)
+
+        # a fresh run of the same length is preferred for resuming
+        fresh_id = self.store.save(fake_results(n_steps=200))
+        config = fake_results(n_steps=300)['config']
+        self.assertEqual(self.store.find_resumable(config)['run_id'],
+                         fresh_id)
+
+    def test_query(self):
+        for T in [1.2, 0.9, 1.0]:
+            self.store.save(fake_results(reduced_T=T))
+        rows = self.store.query(energy='UnitlessLJ', N_particles=4)
+        self.assertEqual([row['reduced_T'] for row in rows], [0.9, 1.0, 1.2])
+        self.assertNotIn('coordinates', rows[0])
+        self.assertEqual(len(self.store.query(reduced_T=1.0)), 1)
+        self.assertEqual(len(self.store.query(N_particles=5)), 0)
+        self.assertRaises(ValueError, self.store.query, temperature=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
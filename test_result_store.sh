@@ -0,0 +1,20 @@
+#!/bin/bash
+
+test -e ssshtest || wget https://raw.githubusercontent.com/ryanlayer/ssshtest/master/ssshtest
+. ssshtest
+
+run test_style pycodestyle test_result_store.py
+assert_no_stdout
+run test_style pycodestyle result_store.py
+assert_no_stdout
+
+echo "...cached run..."
+run test_first_run python3 monte_carlo.py -N 10 -n 1000 -s 1 -d test.db -o test.xyz
+assert_exit_code 0
+run test_cached_run python3 monte_carlo.py -N 10 -n 1000 -s 1 -d test.db -o test.xyz
+assert_in_stdout "Found run 1 in test.db"
+assert_exit_code 0
+run test_resumed_run python3 monte_carlo.py -N 10 -n 2000 -s 1 -d test.db -o test.xyz --resume
+assert_in_stdout "Resuming run 1 after 1000 steps"
+assert_exit_code 0
+rm test.db test.xyz
@@ -0,0 +1,207 @@
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+import numpy as np
+import validate_nist
+
+
+class TestValidateNist(unittest.TestCase):
+    def test_args(self):
+        args = validate_nist.initialize([])
+        self.assertEqual(args.input, 'results/nist_lj_mc.txt')
+        self.assertEqual(args.N_particles, 500)
+        self.assertEqual(args.n_steps, 1000000)
+        self.assertIsNone(args.n_equil)
+        self.assertEqual(args.seed, 2019)
+        self.assertIsNone(args.n_jobs)
+        self.assertEqual(args.n_sigma, 3.0)
+        self.assertEqual(args.max_rel_sem, 0.05)
+        self.assertIsNone(args.output)
+
+        args = validate_nist.initialize(['-n', '100', '--n_equil', '50'])
+        self.assertEqual(args.n_equil, 50)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, validate_nist.initialize,
+                              ['-n', '100', '--n_equil', '100'])
+
+    def test_read_reference(self):
+        reference = validate_nist.read_reference('results/nist_lj_mc.txt')
+        self.assertEqual(reference.shape, (20, 5))
+        self.assertIn([0.9, 0.9, -6.2701, 2.37e-04],
+                      reference[:, :4].tolist())
+
+        # the known failures are optional
+        filename = os.path.join(tempfile.mkdtemp(), 'test.txt')
+        with open(filename, 'w') as f:
+            f.write('0.9 0.9 -6.2701 0.0\n')
+        self.assertEqual(validate_nist.read_reference(filename).tolist(),
+                         [[0.9, 0.9, -6.2701, 0.0, 0.0]])
+        with open(filename, 'w') as f:
+            f.write('0.9 0.9 -6.1773\n')
+        self.assertRaises(ValueError, validate_nist.read_reference, filename)
+        os.remove(filename)
+
+    def test_compare(self):
+        deviation, passed = validate_nist.compare(-6.0, 0.3, -6.5, 0.4, 3)
+        self.assertAlmostEqual(deviation, -1.0)
+        self.assertTrue(passed)
+        deviation, passed = validate_nist.compare(-6.0, 0.0, -6.5, 0.1, 3)
+        self.assertAlmostEqual(deviation, -5.0)
+        self.assertFalse(passed)
+        # no error estimate cannot pass
+        self.assertFalse(validate_nist.compare(-6.0, 0, -6.0, 0, 3)[1])
+        self.assertFalse(validate_nist.compare(-6.0, 0, -6.0, np.nan, 3)[1])
+        # an unconverged run is far off with a huge error
+        deviation, passed = validate_nist.compare(-6.27, 2.4e-4, 2917.8,
+                                                  1023.0, 3)
+        self.assertLess(deviation, 3)
+        self.assertTrue(passed)
+        deviation, passed = validate_nist.compare(-6.27, 2.4e-4, 2917.8,
+                                                  1023.0, 3, max_sem=0.3)
+        self.assertLess(deviation, 3)
+        self.assertFalse(passed)
+        self.assertTrue(validate_nist.compare(-6.0, 0.3, -6.5, 0.4, 3,
+                                              max_sem=0.4)[1])
+        self.assertFalse(validate_nist.compare(-6.0, 0, -6.0, np.nan, 3,
+                                               max_sem=0.4)[1])
+
+    def fake_run(self, config):
+        """
+        Returns the results of a simulation of a state point whose mean
+        energy over the second half of the steps is self.e_sim[reduced_rho]
+        with a standard error of self.e_sem[reduced_rho] (default: 0.01).
+        """
+        noise = np.tile([0.0, 0.0, 0.1, -0.1], config['n_steps'] // 4)
+        energy = self.e_sim[config['reduced_rho']] + noise
+        energy[:config['n_steps'] // 2] = 100.0    # discarded
+        return {'config': config,
+                'energy': energy,
+                'summary': {'e_mean': energy[len(energy) // 2:].mean(),
+                            'e_sem': self.e_sem.get(config['reduced_rho'],
+                                                    0.01)},
+                'wall_time': 1.0}
+
+    def run_main(self, e_sim, argv=[], e_sem=None, known_failure=(0, 0)):
+        self.e_sim, self.e_sem = e_sim, e_sem or {}
+        tmpdir = tempfile.mkdtemp()
+        reference = os.path.join(tmpdir, 'reference.txt')
+        output = os.path.join(tmpdir, 'test.tsv')
+        with open(reference, 'w') as f:
+            f.write('0.9  0.82  -5.7246  0.0  %s\n0.9  0.9  -6.2701  0.0  %s\n'
+                    % known_failure)
+        stdout = io.StringIO()
+        with mock.patch.object(validate_nist.monte_carlo, 'run',
+                               side_effect=self.fake_run) as run, \
+                contextlib.redirect_stdout(stdout):
+            code = validate_nist.main(['-i', reference, '-o', output,
+                                       '-n', '400', '-j', '1'] + argv)
+        with open(output) as f:
+            rows = [line.split('\t') for line in f.read().splitlines()]
+        os.remove(reference)
+        os.remove(output)
+        return code, stdout.getvalue(), rows, run.call_args_list
+
+    def test_main_pass(self):
+        # 1 and -2.9 sigma
+        code, stdout, rows, calls = self.run_main({0.82: -5.7146,
+                                                   0.9: -6.2991})
+        self.assertEqual(code, 0)
+        self.assertIn('2 of 2 state points passed', stdout)
+        self.assertEqual(rows[0][-2:], ['wall_time', 'status'])
+        self.assertEqual([row[-1] for row in rows[1:]], ['PASS', 'PASS'])
+        self.assertAlmostEqual(float(rows[1][5]), 1.0)
+        self.assertAlmostEqual(float(rows[2][5]), -2.9)
+        # one seeded, silent run per state point
+        configs = [call[0][0] for call in calls]
+        self.assertEqual([c['reduced_rho'] for c in configs], [0.82, 0.9])
+        self.assertEqual([c['seed'] for c in configs], [2019, 2020])
+        self.assertEqual([c['n_steps'] for c in configs], [400, 400])
+        self.assertTrue(all(c['quiet'] for c in configs))
+        self.assertTrue(all(c['traj_file'] is None for c in configs))
+
+    def test_main_fail(self):
+        # 1 and 3.1 sigma
+        code, stdout, rows, calls = self.run_main({0.82: -5.7146,
+                                                   0.9: -6.2391})
+        self.assertEqual(code, 1)
+        self.assertIn('1 of 2 state points passed', stdout)
+        self.assertEqual([row[-1] for row in rows[1:]], ['PASS', 'FAIL'])
+        self.assertAlmostEqual(float(rows[2][5]), 3.1)
+
+        # a looser threshold passes
+        code, stdout, rows, calls = self.run_main(
+            {0.82: -5.7146, 0.9: -6.2391}, ['-k', '4'])
+        self.assertEqual(code, 0)
+
+    def test_main_unconverged(self):
+        # far off, but within 3 sigma of a huge error
+        code, stdout, rows, calls = self.run_main({0.82: -5.7146,
+                                                   0.9: 2917.84},
+                                                  e_sem={0.9: 1023.0})
+        self.assertEqual(code, 1)
+        self.assertIn('1 of 2 state points passed', stdout)
+        self.assertLess(float(rows[2][5]), 3)
+        self.assertEqual([row[-1] for row in rows[1:]],
+                         ['PASS', 'UNCONVERGED'])
+
+        # only passes without a limit on the error
+        code, stdout, rows, calls = self.run_main(
+            {0.82: -5.7146, 0.9: 2917.84}, ['--max_rel_sem', 'inf'],
+            e_sem={0.9: 1023.0})
+        self.assertEqual(code, 0)
+
+    def test_main_known_failure(self):
+        # 1 and 3.1 sigma, the latter is a known failure
+        code, stdout, rows, calls = self.run_main({0.82: -5.7146,
+                                                   0.9: -6.2391},
+                                                  known_failure=(0, 1))
+        self.assertEqual(code, 0)
+        self.assertIn('1 of 2 state points passed, 0 unexpected failures',
+                      stdout)
+        self.assertEqual([row[-1] for row in rows[1:]], ['PASS', 'XFAIL'])
+
+        # a known failure that passes does not fail the validation either
+        code, stdout, rows, calls = self.run_main({0.82: -5.7146,
+                                                   0.9: -6.2701},
+                                                  known_failure=(1, 1))
+        self.assertEqual(code, 0)
+        self.assertEqual([row[-1] for row in rows[1:]], ['XPASS', 'XPASS'])
+
+        # unlike any other failure
+        code, stdout, rows, calls = self.run_main({0.82: -5.6146,
+                                                   0.9: -6.2391},
+                                                  known_failure=(0, 1))
+        self.assertEqual(code, 1)
+        self.assertIn('0 of 2 state points passed, 1 unexpected failures',
+                      stdout)
+        self.assertEqual([row[-1] for row in rows[1:]], ['FAIL', 'XFAIL'])
+
+    def test_main_n_equil(self):
+        # the summary is recomputed from the steps after the first 100, a
+        # third of which still have the energy of the discarded half
+        code, stdout, rows, calls = self.run_main({0.82: -5.7246,
+                                                   0.9: -6.2701},
+                                                  ['--n_equil', '100'])
+        self.assertIn('The number of equilibration steps:  100', stdout)
+        self.assertAlmostEqual(float(rows[1][3]),
+                               (100 * 100.0 - 200 * 5.7246) / 300)
+
+    def test_simulate(self):
+        self.e_sim, self.e_sem = {0.9: -6.0}, {}
+        config = {'reduced_rho': 0.9, 'n_steps': 400}
+        with mock.patch.object(validate_nist.monte_carlo, 'run',
+                               side_effect=self.fake_run):
+            results = validate_nist.simulate(config)
+            self.assertIsNone(results['energy'])
+            self.assertEqual(results['summary']['e_sem'], 0.01)
+            results = validate_nist.simulate(config, n_equil=200)
+        self.assertIsNone(results['energy'])
+        self.assertAlmostEqual(results['summary']['e_mean'], -6.0)
+        self.assertEqual(results['summary']['n_average'], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/bin/bash
+
+test -e ssshtest || wget https://raw.githubusercontent.com/ryanlayer/ssshtest/master/ssshtest
+. ssshtest
+
+run test_style pycodestyle validate_nist.py
+assert_no_stdout
+
+echo "...short validation run..."
+run test_short_run python3 validate_nist.py -N 20 -n 2000 -j 2 -o test.tsv
+assert_in_stdout "Wall time per state point"
+assert_in_stdout "state points passed"
+# far too short to converge, which must not count as agreement
+assert_in_stdout "UNCONVERGED"
+assert_exit_code 1
+rm test.tsv
+
+# references that the short runs cannot miss (without a limit on the
+# statistical error) or cannot match
+echo "0.9  0.9  -6.2701  100.0" > loose.txt
+echo "0.9  0.9  100.0  0.0" > wrong.txt
+
+run test_exit_pass python3 validate_nist.py -i loose.txt -N 20 -n 2000 --n_equil 500 --max_rel_sem inf -j 1
+assert_in_stdout "1 of 1 state points passed"
+assert_exit_code 0
+
+run test_exit_fail python3 validate_nist.py -i wrong.txt -N 20 -n 2000 -j 1
+assert_in_stdout "0 of 1 state points passed"
+assert_exit_code 1
+
+run test_n_equil python3 validate_nist.py -i loose.txt -n 2000 --n_equil 2000
+assert_exit_code 2
+
+echo "0.9  0.9  100.0  0.0  1" > known.txt
+run test_known_failure python3 validate_nist.py -i known.txt -N 20 -n 2000 -j 1
+assert_in_stdout "XFAIL"
+assert_exit_code 0
+rm loose.txt wrong.txt known.txt